@@ -1,6 +1,7 @@
+import io
 import streamlit as st
 import pandas as pd
-from datetime import datetime, time, timedelta
+from pairing_core import HELPER_COLS, all_weekdays, apply_filters, parse_flight_pairings_csv
 
 st.set_page_config(page_title="Flight Pairing Finder", layout="wide")
 
@@ -13,52 +14,8 @@ if csv_file is None:
     st.info("Please upload a CSV file to begin.")
     st.stop()
 
-# --- Data Loading and Processing Function ---
-@st.cache_data
-def parse_flight_pairings_csv(csv_file):
-    df = pd.read_csv(csv_file)
-    required_cols = ['Pairing', 'Departure', 'Arrival', 'Block hours', 'Pairing details', 'Duration']
-    if not all(col in df.columns for col in required_cols):
-        st.error(f"CSV is missing required columns: {', '.join([col for col in required_cols if col not in df.columns])}")
-        return pd.DataFrame()
-
-    df['Departure'] = pd.to_datetime(df['Departure'], format='%b %d,%Y %H:%M', errors='coerce')
-    df['Arrival'] = pd.to_datetime(df['Arrival'], format='%b %d,%Y %H:%M', errors='coerce')
-    df['Block hours'] = pd.to_timedelta(df['Block hours'].astype(str) + ':00', errors='coerce')
-    df['Departure Day'] = df['Departure'].dt.day_name().str.lower()
-    df['Arrival Day'] = df['Arrival'].dt.day_name().str.lower()
-
-    def count_roundtrips(pairing_details):
-        if pd.isna(pairing_details):
-            return 0
-        airport_list = [a.strip() for a in pairing_details.split('-')]
-        home_base = 'PTY'
-        pty_count_after_first = 0
-        found_first_pty = False
-        for airport in airport_list:
-            if airport == home_base:
-                if found_first_pty:
-                    pty_count_after_first += 1
-                else:
-                    found_first_pty = True
-        return pty_count_after_first
-
-    df['Roundtrips'] = df['Pairing details'].astype(str).apply(count_roundtrips)
-    def calculate_actual_flights_per_day(row):
-        pairing_details = row['Pairing details']
-        duration = row['Duration']
-        if pd.isna(pairing_details) or pd.isna(duration) or duration == 0:
-            return 0.0
-        num_segments = pairing_details.count('-') + 1
-        return num_segments / duration
-    df['Actual Flights per Day'] = df.apply(calculate_actual_flights_per_day, axis=1)
-    df['Pairing Duration Days'] = pd.to_numeric(df['Duration'], errors='coerce')
-    df['Block Hours per Pairing Day'] = df.apply(lambda row: (row['Block hours'].total_seconds() / 3600) / row['Pairing Duration Days'] if pd.notna(row['Block hours']) and pd.notna(row['Pairing Duration Days']) and row['Pairing Duration Days'] > 0 else 0, axis=1)
-    df['Block hours total'] = df['Block hours'].dt.total_seconds() / 3600
-
-    return df
-
-df = parse_flight_pairings_csv(csv_file)
+# --- Data Loading and Processing ---
+df = parse_flight_pairings_csv(csv_file.getvalue())
 if df.empty:
     st.warning("No data to display.")
     st.stop()
@@ -67,13 +24,12 @@ if df.empty:
 st.sidebar.header("Filter & Sort Preferences")
 
 # Date filters
-departure_dates = pd.Series(df['Departure'].dt.date.dropna().unique()).sort_values()
-specific_departure_date = st.sidebar.selectbox("Specific departure date", options=["Any"] + departure_dates.astype(str).tolist())
-arrival_dates = pd.Series(df['Arrival'].dt.date.dropna().unique()).sort_values()
-specific_arrival_date = st.sidebar.selectbox("Specific arrival date", options=["Any"] + arrival_dates.astype(str).tolist())
+departure_dates = pd.Series(df['Departure Date'].dropna().unique()).sort_values()
+specific_departure_date = st.sidebar.selectbox("Specific departure date", options=["Any"] + departure_dates.tolist())
+arrival_dates = pd.Series(df['Arrival Date'].dropna().unique()).sort_values()
+specific_arrival_date = st.sidebar.selectbox("Specific arrival date", options=["Any"] + arrival_dates.tolist())
 
 # Weekday filters
-all_weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
 preferred_departure_weekday = st.sidebar.selectbox("Preferred departure weekday", ["Any"] + [d.capitalize() for d in all_weekdays])
 preferred_arrival_weekday = st.sidebar.selectbox("Preferred arrival weekday", ["Any"] + [d.capitalize() for d in all_weekdays])
 
@@ -95,37 +51,19 @@ sort_column = st.sidebar.selectbox("Sort by", options=['Departure', 'Arrival', '
 sort_ascending = st.sidebar.checkbox("Sort ascending", value=False)
 
 # --- Filtering ---
-filtered_df = df.copy()
-
-if specific_departure_date != "Any":
-    filtered_df = filtered_df[filtered_df['Departure'].dt.date.astype(str) == specific_departure_date]
-if specific_arrival_date != "Any":
-    filtered_df = filtered_df[filtered_df['Arrival'].dt.date.astype(str) == specific_arrival_date]
-if preferred_departure_weekday != "Any":
-    filtered_df = filtered_df[filtered_df['Departure Day'] == preferred_departure_weekday.lower()]
-if preferred_arrival_weekday != "Any":
-    filtered_df = filtered_df[filtered_df['Arrival Day'] == preferred_arrival_weekday.lower()]
-if preferred_weekdays:
-    def all_days_in(row):
-        days = pd.date_range(row['Departure'], row['Arrival']).day_name().str.lower().unique()
-        return all(d in [w.lower() for w in preferred_weekdays] for d in days)
-    filtered_df = filtered_df[filtered_df.apply(all_days_in, axis=1)]
-if earliest_departure is not None:
-    filtered_df = filtered_df[filtered_df['Departure'].dt.time >= earliest_departure]
-if earliest_arrival is not None:
-    filtered_df = filtered_df[filtered_df['Arrival'].dt.time >= earliest_arrival]
-if min_duration > 0:
-    filtered_df = filtered_df[filtered_df['Block hours total'] >= min_duration]
-if max_duration > 0:
-    filtered_df = filtered_df[filtered_df['Block hours total'] <= max_duration]
-if max_roundtrips > 0:
-    filtered_df = filtered_df[filtered_df['Roundtrips'] <= max_roundtrips]
-if max_actual_flights_per_day > 0:
-    filtered_df = filtered_df[filtered_df['Actual Flights per Day'] <= max_actual_flights_per_day]
-if min_block_hours_per_day > 0:
-    filtered_df = filtered_df[filtered_df['Block Hours per Pairing Day'] >= min_block_hours_per_day]
-
-filtered_df = filtered_df.sort_values(by=sort_column, ascending=sort_ascending)
+filtered_df = apply_filters(
+    df,
+    specific_departure_date=specific_departure_date, specific_arrival_date=specific_arrival_date,
+    preferred_departure_weekday=preferred_departure_weekday, preferred_arrival_weekday=preferred_arrival_weekday,
+    preferred_weekdays=preferred_weekdays,
+    earliest_departure=earliest_departure, earliest_arrival=earliest_arrival,
+    min_duration=min_duration, max_duration=max_duration, max_roundtrips=max_roundtrips,
+    max_actual_flights_per_day=max_actual_flights_per_day, min_block_hours_per_day=min_block_hours_per_day,
+    sort_column=sort_column, sort_ascending=sort_ascending)
+# Nothing left to render
+if filtered_df.empty:
+    st.success("Found 0 matching pairings.")
+    st.stop()
 
 st.success(f"Found {len(filtered_df)} matching pairings.")
 
@@ -133,5 +71,8 @@ st.success(f"Found {len(filtered_df)} matching pairings.")
 st.dataframe(filtered_df[['Pairing', 'Departure', 'Arrival', 'Block hours', 'Pairing details', 'Block hours total', 'Block Hours per Pairing Day', 'Roundtrips', 'Actual Flights per Day']])
 
 # --- Download Option ---
-csv = filtered_df.to_csv(index=False)
-st.download_button("Download filtered results as CSV", csv, file_name="filtered_pairings.csv", mime="text/csv")
\ No newline at end of file
+# Write the CSV bytes straight into a buffer instead of building the whole text as a str first
+csv_buffer = io.BytesIO()
+filtered_df.drop(columns=HELPER_COLS).to_csv(csv_buffer, index=False)
+csv_buffer.seek(0)
+st.download_button("Download filtered results as CSV", csv_buffer, file_name="filtered_pairings.csv", mime="text/csv")
\ No newline at end of file
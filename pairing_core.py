@@ -0,0 +1,273 @@
+"""Shared parsing and filtering for the Flight Pairing Finder Streamlit apps.
+
+Both flight_pairing_app.py and flight_pairing_finder_full.py import from here, so the parsed
+frame is cached once per uploaded CSV and shared across the two pages.
+"""
+import contextlib
+import csv
+import functools
+import hashlib
+import io
+import operator
+import tempfile
+from pathlib import Path
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from datetime import datetime
+
+all_weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+# Parsed frames persisted as Parquet so cold restarts skip re-parsing an already seen CSV.
+# Nothing is evicted: the directory grows by one file per distinct upload and parser version.
+PARQUET_CACHE_DIR = Path(__file__).parent / '.cache'
+# Part of the cache file name; bump whenever parse_flight_pairings_csv's output changes
+PARSER_VERSION = 3
+# Timedelta columns sort by their precomputed numeric counterpart
+SORT_KEYS = {'Block hours': 'Block hours total'}
+# Derived columns that only exist to speed up the filters; left out of the downloaded CSV
+HELPER_COLS = ['Weekday Mask', 'Departure Date', 'Arrival Date', 'Departure TOD', 'Arrival TOD']
+
+
+def seconds_since_midnight(t):
+    return t.hour * 3600 + t.minute * 60 + t.second
+
+
+# Cached on the uploaded bytes, so re-uploading the same file reuses the parsed + augmented frame
+@st.cache_data
+def parse_flight_pairings_csv(csv_bytes):
+    """
+    Parses the flight pairings CSV and adds every derived column the filters and tables use.
+
+    Args:
+        csv_bytes (bytes): Raw contents of the uploaded CSV file.
+
+    Returns:
+        pd.DataFrame: Parsed pairings sorted by 'Departure', or an empty DataFrame if the file
+                      cannot be read or required columns are missing.
+    """
+    cache_path = PARQUET_CACHE_DIR / f"pairings-v{PARSER_VERSION}-{hashlib.md5(csv_bytes).hexdigest()}.parquet"
+    if cache_path.exists():
+        return pd.read_parquet(cache_path, engine='pyarrow')
+    # Arrow CSV reader with every header column typed as a string up front: Arrow's own inference
+    # would turn 'HH:MM' values (block hours, report times) into times and fail casting blank cells
+    # in integer columns, so extra columns would no longer round-trip into the download unchanged
+    header = next(csv.reader([csv_bytes.split(b'\n', 1)[0].rstrip(b'\r').decode('utf-8-sig', errors='replace')]), [])
+    convert_options = pa_csv.ConvertOptions(column_types={col: pa.string() for col in header},
+                                            strings_can_be_null=True)
+    try:
+        table = pa_csv.read_csv(io.BytesIO(csv_bytes), convert_options=convert_options)
+    except pa.ArrowInvalid:
+        table = None  # e.g. rows with missing trailing fields, which Arrow rejects
+    try:
+        if table is not None and len(set(table.column_names)) == len(table.column_names):
+            df = table.to_pandas()
+        else:
+            # The C engine pads short rows with NaN and renames duplicate headers ('Note' -> 'Note.1')
+            df = pd.read_csv(io.BytesIO(csv_bytes), dtype=str)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        st.error(f"Could not read CSV: {e}")
+        return pd.DataFrame()
+    required_cols = ['Pairing', 'Departure', 'Arrival', 'Block hours', 'Pairing details', 'Duration']
+    if not all(col in df.columns for col in required_cols):
+        st.error(f"CSV is missing required columns: {', '.join([col for col in required_cols if col not in df.columns])}")
+        return pd.DataFrame()
+    # Numeric columns become numbers only when every non-blank cell is one (like the C engine's inference)
+    for col in ['Pairing', 'Duration']:
+        numeric = pd.to_numeric(df[col], errors='coerce')
+        if numeric.notna().sum() == df[col].notna().sum():
+            df[col] = numeric
+    # Parse datetimes and block hours
+    month_numbers = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+                     'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'}
+    def parse_pairing_datetime(values):
+        # 'Jan 05,2025 14:30' -> '2025-01-05 14:30' so pandas uses its fast ISO parser instead of %b
+        values = values.astype(str)
+        iso = (values.str.slice(7, 11) + '-' + values.str.slice(0, 3).map(month_numbers) + '-'
+               + values.str.slice(4, 6) + ' ' + values.str.slice(12))
+        parsed = pd.to_datetime(iso, format='%Y-%m-%d %H:%M', errors='coerce')
+        # Fall back to the original format for rows the fixed-width slicing missed (e.g. unpadded days)
+        missed = parsed.isna() & values.notna()
+        if missed.any():
+            parsed[missed] = pd.to_datetime(values[missed], format='%b %d,%Y %H:%M', errors='coerce')
+        return parsed
+    df['Departure'] = parse_pairing_datetime(df['Departure'])
+    df['Arrival'] = parse_pairing_datetime(df['Arrival'])
+    # 'HH:MM' block hours -> minutes with vectorized string ops; the Timedelta is only kept for display
+    # (reindexed, since the split yields fewer columns when the column is empty or has no ':' at all)
+    block_parts = df['Block hours'].astype(str).str.split(':', n=1, expand=True).reindex(columns=[0, 1])
+    block_minutes = pd.to_numeric(block_parts[0], errors='coerce') * 60 + pd.to_numeric(block_parts[1], errors='coerce')
+    df['Block hours'] = pd.to_timedelta(block_minutes, unit='m')
+    df['Departure Day'] = pd.Categorical(df['Departure'].dt.day_name().str.lower(), categories=all_weekdays)
+    df['Arrival Day'] = pd.Categorical(df['Arrival'].dt.day_name().str.lower(), categories=all_weekdays)
+    # Weekday Mask: bit i set if the pairing covers weekday i (monday = bit 0) on any calendar day
+    dep_dow = df['Departure'].dt.dayofweek.fillna(0).astype(int).values
+    span_days = (df['Arrival'].dt.normalize() - df['Departure'].dt.normalize()).dt.days.fillna(-1).values
+    weekday_mask = np.zeros(len(df), dtype=np.uint8)
+    for offset in range(len(all_weekdays)):
+        weekday_bit = (1 << ((dep_dow + offset) % 7)).astype(np.uint8)
+        weekday_mask |= np.where(span_days >= offset, weekday_bit, 0).astype(np.uint8)
+    # Rows with a NaT departure/arrival get bit 7, which no weekday selection allows, so they fail
+    # every selection (even all seven weekdays) like the -1 TOD sentinel below
+    dates_valid = (df['Departure'].notna() & df['Arrival'].notna()).values
+    df['Weekday Mask'] = np.where(dates_valid, weekday_mask, 0x80).astype(np.uint8)
+    df['Departure Date'] = df['Departure'].dt.strftime('%Y-%m-%d')
+    df['Arrival Date'] = df['Arrival'].dt.strftime('%Y-%m-%d')
+    # Seconds since midnight as int32 (-1 for NaT, so it never passes an 'earliest time' filter)
+    df['Departure TOD'] = (df['Departure'] - df['Departure'].dt.normalize()).dt.total_seconds().fillna(-1).astype('int32')
+    df['Arrival TOD'] = (df['Arrival'] - df['Arrival'].dt.normalize()).dt.total_seconds().fillna(-1).astype('int32')
+    # Calculate Roundtrips (number of 'PTY' legs after the first one in the pairing details)
+    pty_count = df['Pairing details'].fillna('').astype(str).str.count(r'(?:^|-)\s*PTY\s*(?=-|$)')
+    df['Roundtrips'] = (pty_count - 1).clip(lower=0)
+    # Calculate Actual Flights per Day
+    num_segments = df['Pairing details'].fillna('').astype(str).str.count('-') + 1
+    duration_days = pd.to_numeric(df['Duration'], errors='coerce')
+    df['Actual Flights per Day'] = np.where(
+        df['Pairing details'].notna() & duration_days.notna() & (duration_days != 0),
+        num_segments / duration_days.replace(0, np.nan), 0.0)
+    # Pairing Duration Days
+    df['Pairing Duration Days'] = duration_days
+    # Block Hours per Pairing Day (block hours total is in hours)
+    block_hours_total = block_minutes / 60
+    df['Block Hours per Pairing Day'] = np.where(
+        block_hours_total.notna() & (duration_days > 0),
+        block_hours_total / duration_days.where(duration_days > 0), 0.0)
+    df['Block hours total'] = block_hours_total
+    # Boosted Hours (weekend or Panama holiday)
+    holidays_2025 = [
+        datetime(2025, 1, 1), datetime(2025, 3, 4), datetime(2025, 4, 18), datetime(2025, 5, 1),
+        datetime(2025, 11, 3), datetime(2025, 11, 4), datetime(2025, 11, 5), datetime(2025, 11, 10),
+        datetime(2025, 11, 28), datetime(2025, 12, 8), datetime(2025, 12, 25)
+    ]
+    holidays_dt = np.array(holidays_2025, dtype='datetime64[s]')
+    end_of_day = np.timedelta64(23 * 3600 + 59 * 60 + 59, 's')
+    def overlap_hours(start, end):
+        return np.clip((end - start) / np.timedelta64(1, 'h'), 0.0, None)
+    dep = df['Departure'].values.astype('datetime64[s]')
+    arr = df['Arrival'].values.astype('datetime64[s]')
+    valid = ~np.isnat(dep) & ~np.isnat(arr) & df['Block hours total'].notna().values
+    dep_day = dep.astype('datetime64[D]')
+    arr_day = arr.astype('datetime64[D]')
+    # Departure day
+    dep_weekend = (df['Departure'].dt.dayofweek >= 5).values
+    boosted = np.where(dep_weekend, overlap_hours(dep, np.minimum(arr, dep_day + end_of_day)), 0.0)
+    # Arrival day (if different)
+    arr_weekend = (df['Arrival'].dt.dayofweek >= 5).values & (arr_day != dep_day)
+    boosted += np.where(arr_weekend, overlap_hours(np.maximum(dep, arr_day), arr), 0.0)
+    # Full weekend days in between
+    first_between = np.where(valid, dep_day + 1, np.datetime64(0, 'D'))
+    last_between = np.where(valid, np.maximum(arr_day, first_between), first_between)
+    days_between = (last_between - first_between).astype('int64')
+    boosted += 24 * (days_between - np.busday_count(first_between, last_between))
+    # Holidays
+    for holiday in holidays_dt:
+        boosted += overlap_hours(np.maximum(dep, holiday), np.minimum(arr, holiday + end_of_day))
+    df['Boosted Hours'] = np.where(valid, np.minimum(boosted, df['Block hours total'].values), 0.0)
+    # Sorted by departure so a single departure date is one contiguous block (see apply_filters)
+    df = df.sort_values('Departure', kind='stable')
+    tmp_path = None
+    try:
+        PARQUET_CACHE_DIR.mkdir(exist_ok=True)
+        # Write to a temp file of our own, then rename: an interrupted write never leaves a truncated
+        # cache file behind, and concurrent sessions parsing the same upload never share a temp file
+        with tempfile.NamedTemporaryFile(dir=PARQUET_CACHE_DIR, suffix='.tmp', delete=False) as tmp_file:
+            tmp_path = Path(tmp_file.name)
+            df.to_parquet(tmp_file, engine='pyarrow')
+        tmp_path.replace(cache_path)
+    except OSError:
+        # The on-disk cache is best effort (e.g. read-only deployments, full disk); just don't leave
+        # a partial temp file behind in a directory that is never evicted
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                tmp_path.unlink(missing_ok=True)
+    return df
+
+
+def apply_filters(df, specific_departure_date="Any", specific_arrival_date="Any", excluded_dates=(),
+                  preferred_departure_weekday="Any", preferred_arrival_weekday="Any", preferred_weekdays=(),
+                  earliest_departure=None, earliest_arrival=None, min_duration=0.0, max_duration=0.0,
+                  max_roundtrips=0, max_actual_flights_per_day=0.0, min_block_hours_per_day=0.0,
+                  sort_column='Departure', sort_ascending=False):
+    """
+    Filters and sorts pairings according to the sidebar options ("Any", empty, None or 0 = no filter).
+
+    Args:
+        df (pd.DataFrame): Frame returned by parse_flight_pairings_csv (must stay sorted by 'Departure').
+
+    Returns:
+        pd.DataFrame: Matching pairings sorted by sort_column.
+    """
+    sort_key = SORT_KEYS.get(sort_column, sort_column)
+
+    # df is sorted by Departure, so a specific departure date is located with two binary searches
+    candidates = df
+    if specific_departure_date != "Any":
+        day_start = np.datetime64(specific_departure_date)
+        lo, hi = df['Departure'].values.searchsorted([day_start, day_start + np.timedelta64(1, 'D')])
+        candidates = df.iloc[lo:hi]
+
+    # Collect predicates (frame -> boolean array) first, then combine them into one mask and index once
+    predicates = []
+
+    # Specific arrival date
+    if specific_arrival_date != "Any":
+        predicates.append(lambda f: (f['Arrival Date'] == specific_arrival_date).values)
+
+    # Exclude dates: improved logic to exclude pairings where ANY day in the pairing's range matches an excluded date
+    if excluded_dates:
+        excluded_dates_dt = np.sort(np.array(excluded_dates, dtype='datetime64[D]'))
+        def avoids_excluded_dates(f):
+            dep_day = f['Departure'].values.astype('datetime64[D]')
+            arr_day = f['Arrival'].values.astype('datetime64[D]')
+            # First excluded date on/after departure; the pairing hits it if that date is on/before arrival.
+            # NaT departures/arrivals never hit, so invalid rows are not excluded.
+            next_idx = excluded_dates_dt.searchsorted(dep_day)
+            next_excluded = excluded_dates_dt[np.minimum(next_idx, len(excluded_dates_dt) - 1)]
+            return ~((next_idx < len(excluded_dates_dt)) & (next_excluded <= arr_day))
+        predicates.append(avoids_excluded_dates)
+
+    # Preferred departure or arrival weekday
+    if preferred_departure_weekday != "Any":
+        predicates.append(lambda f: (f['Departure Day'] == preferred_departure_weekday.lower()).values)
+    if preferred_arrival_weekday != "Any":
+        predicates.append(lambda f: (f['Arrival Day'] == preferred_arrival_weekday.lower()).values)
+
+    # Preferred weekdays for all days in pairing
+    if preferred_weekdays:
+        allowed_mask = np.uint8(sum(1 << all_weekdays.index(d.lower()) for d in preferred_weekdays))
+        predicates.append(lambda f: (f['Weekday Mask'].values & ~allowed_mask) == 0)
+
+    # Earliest departure/arrival time
+    if earliest_departure is not None:
+        earliest_departure_s = seconds_since_midnight(earliest_departure)
+        predicates.append(lambda f: f['Departure TOD'].values >= earliest_departure_s)
+    if earliest_arrival is not None:
+        earliest_arrival_s = seconds_since_midnight(earliest_arrival)
+        predicates.append(lambda f: f['Arrival TOD'].values >= earliest_arrival_s)
+
+    # Numeric filters
+    if min_duration > 0:
+        predicates.append(lambda f: f['Block hours total'].values >= min_duration)
+    if max_duration > 0:
+        predicates.append(lambda f: f['Block hours total'].values <= max_duration)
+    if max_roundtrips > 0:
+        predicates.append(lambda f: f['Roundtrips'].values <= max_roundtrips)
+    if max_actual_flights_per_day > 0:
+        predicates.append(lambda f: f['Actual Flights per Day'].values <= max_actual_flights_per_day)
+    if min_block_hours_per_day > 0:
+        predicates.append(lambda f: f['Block Hours per Pairing Day'].values >= min_block_hours_per_day)
+
+    mask = functools.reduce(operator.and_, (predicate(candidates) for predicate in predicates),
+                            np.ones(len(candidates), dtype=bool))
+
+    # Nothing left to sort
+    if not mask.any():
+        return candidates.iloc[:0]
+
+    filtered_df = candidates.loc[mask]
+
+    # Sorting
+    if sort_key in filtered_df.columns:
+        filtered_df = filtered_df.sort_values(by=sort_key, ascending=sort_ascending, kind='stable')
+    return filtered_df
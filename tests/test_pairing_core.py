@@ -0,0 +1,201 @@
+import pandas as pd
+import pytest
+
+import pairing_core
+
+COLUMNS = ['Pairing', 'Departure', 'Arrival', 'Block hours', 'Pairing details', 'Duration']
+
+
+@pytest.fixture
+def parse(tmp_path, monkeypatch):
+    # Fresh parse on every call: no Streamlit memo and no Parquet cache shared between tests
+    monkeypatch.setattr(pairing_core, 'PARQUET_CACHE_DIR', tmp_path)
+
+    def _parse(rows):
+        # rows: list of field lists, or the raw CSV text
+        pairing_core.parse_flight_pairings_csv.clear()
+        csv = rows if isinstance(rows, str) else pd.DataFrame(rows, columns=COLUMNS).to_csv(index=False)
+        return pairing_core.parse_flight_pairings_csv(csv.encode()).sort_index()
+    return _parse
+
+
+def pairing(details='PTY-MIA-PTY', departure='Jan 07,2025 08:00', arrival='Jan 07,2025 12:00',
+            block_hours='04:00', duration='1'):
+    return ['1', departure, arrival, block_hours, details, duration]
+
+
+def test_blank_numeric_cells(parse):
+    df = parse([pairing(duration=''), ['', 'Jan 07,2025 08:00', 'Jan 07,2025 12:00', '04:00', 'PTY-MIA', '2']])
+    assert df['Pairing'].isna().tolist() == [False, True]
+    assert df['Duration'].isna().tolist() == [True, False]
+    assert df['Actual Flights per Day'].tolist() == [0.0, 1.0]
+    assert df['Block Hours per Pairing Day'].tolist() == [0.0, 2.0]
+
+
+def test_row_missing_trailing_field(parse):
+    df = parse(','.join(COLUMNS) + '\n'
+               '1,"Jan 07,2025 08:00","Jan 07,2025 12:00",04:00,PTY-MIA-PTY,1\n'
+               '2,"Jan 07,2025 08:00","Jan 07,2025 12:00",04:00,PTY-MIA-PTY\n')
+    assert df['Pairing'].tolist() == [1, 2]
+    assert df['Duration'].isna().tolist() == [False, True]
+    assert df['Block hours total'].tolist() == [4.0, 4.0]
+
+
+def test_duplicate_header_names(parse):
+    df = parse(','.join(COLUMNS) + ',Note,Note\n'
+               '1,"Jan 07,2025 08:00","Jan 07,2025 12:00",04:00,PTY-MIA-PTY,1,a,b\n')
+    assert df[['Note', 'Note.1']].values.tolist() == [['a', 'b']]
+    assert df['Roundtrips'].tolist() == [1]
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_extra_columns_round_trip_as_text(parse, newline):
+    df = parse(newline.join([
+        ','.join(COLUMNS) + ',Report time,Credit',
+        '1,"Jan 07,2025 08:00","Jan 07,2025 12:00",04:00,PTY-MIA-PTY,1,03:00,1.50',
+        '2,"Jan 08,2025 08:00","Jan 08,2025 12:00",04:00,PTY-MIA-PTY,1,,2', '']))
+    assert df['Report time'].tolist()[0] == '03:00'
+    assert df['Report time'].isna().tolist() == [False, True]
+    assert df['Credit'].tolist() == ['1.50', '2']
+
+
+def test_block_hours_under_a_day_are_not_read_as_times(parse):
+    df = parse([pairing(block_hours='03:00'), pairing(block_hours='13:45')])
+    assert df['Block hours total'].tolist() == [3.0, 13.75]
+
+
+@pytest.mark.parametrize('details, expected', [
+    ('MIA-BOG', 0),                       # no PTY
+    ('PTY-MIA', 0),                       # single PTY
+    ('PTY-MIA-PTY', 1),
+    ('', 0),                              # NaN
+    ('PTY - MIA - PTY - BOG - PTY', 2),   # spaced tokens
+    ('MIA-PTY-BOG-PTY', 1),               # first PTY is not the leading leg
+    ('PTYX-XPTY-PTY', 0),                 # PTY only counts as a whole token
+])
+def test_roundtrips(parse, details, expected):
+    assert parse([pairing(details=details)])['Roundtrips'].tolist() == [expected]
+
+
+@pytest.mark.parametrize('departure, arrival, block_hours, expected', [
+    # Weekday only
+    ('Jan 07,2025 08:00', 'Jan 07,2025 12:00', '04:00', 0.0),
+    # Saturday evening into Sunday: departure day ends at 23:59:59, arrival day starts at 00:00
+    ('Jan 04,2025 20:00', 'Jan 05,2025 02:00', '06:00', 6 - 1 / 3600),
+    # Saturday, capped at the block hours
+    ('Jan 04,2025 08:00', 'Jan 04,2025 18:00', '03:00', 3.0),
+    # Full weekend days between a Friday departure and a Monday arrival
+    ('Jan 03,2025 08:00', 'Jan 06,2025 10:00', '60:00', 48.0),
+    # Holiday (Jan 1st, a Wednesday)
+    ('Jan 01,2025 10:00', 'Jan 01,2025 14:00', '04:00', 4.0),
+    # Only the part after midnight falls on the holiday
+    ('Dec 31,2024 22:00', 'Jan 01,2025 00:30', '02:30', 0.5),
+    # Arrival before departure, same day and across a weekend
+    ('Jan 04,2025 10:00', 'Jan 04,2025 08:00', '02:00', 0.0),
+    ('Jan 05,2025 10:00', 'Jan 04,2025 10:00', '24:00', 0.0),
+    # NaT departure / arrival
+    ('not a date', 'Jan 04,2025 10:00', '02:00', 0.0),
+    ('Jan 04,2025 10:00', '', '02:00', 0.0),
+])
+def test_boosted_hours(parse, departure, arrival, block_hours, expected):
+    df = parse([pairing(departure=departure, arrival=arrival, block_hours=block_hours)])
+    assert df['Boosted Hours'].tolist() == [pytest.approx(expected)]
+
+
+def test_weekday_mask_rejects_invalid_dates(parse):
+    # Tue..Wed pairing, then rows with a NaT departure and a NaT arrival
+    df = parse([pairing(arrival='Jan 08,2025 12:00'), pairing(departure='not a date'), pairing(arrival='')])
+    assert df['Weekday Mask'].tolist() == [0b0000110, 0x80, 0x80]
+    filtered = pairing_core.apply_filters(df, preferred_weekdays=['Tuesday', 'Wednesday'])
+    assert filtered.index.tolist() == [0]
+    every_day = [d.capitalize() for d in pairing_core.all_weekdays]
+    assert pairing_core.apply_filters(df, preferred_weekdays=every_day).index.tolist() == [0]
+
+
+def test_helper_columns_exist(parse):
+    # The apps drop these before the CSV download
+    assert set(pairing_core.HELPER_COLS) <= set(parse([pairing()]).columns)
+
+
+def test_parquet_cache_is_keyed_on_parser_version(parse, tmp_path, monkeypatch):
+    parse([pairing()])
+    cached = list(tmp_path.iterdir())
+    assert [path.name.startswith(f'pairings-v{pairing_core.PARSER_VERSION}-') for path in cached] == [True]
+    # A frame written by another parser version is never read back
+    stale = pd.DataFrame({'Pairing': ['stale']})
+    stale.to_parquet(cached[0])
+    monkeypatch.setattr(pairing_core, 'PARSER_VERSION', pairing_core.PARSER_VERSION + 1)
+    assert parse([pairing()])['Pairing'].tolist() == [1]
+    assert len(list(tmp_path.glob('*.parquet'))) == 2
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_header_only_csv(parse):
+    df = parse([])
+    assert df.empty
+    assert 'Boosted Hours' in df.columns
+
+
+def test_all_blank_block_hours(parse):
+    df = parse([pairing(block_hours=''), pairing(block_hours='')])
+    assert df['Block hours'].isna().all()
+    assert df['Block Hours per Pairing Day'].tolist() == [0.0, 0.0]
+    assert df['Boosted Hours'].tolist() == [0.0, 0.0]
+
+
+
+def test_failed_cache_write_leaves_no_temp_file(parse, tmp_path, monkeypatch):
+    def to_parquet_disk_full(self, path, **kwargs):
+        path.write(b'partial')
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', to_parquet_disk_full)
+    assert parse([pairing()])['Roundtrips'].tolist() == [1]
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.fixture
+def trips(parse):
+    # 0: Jan 05 (Sun), 1: Jan 07..09 (Tue..Thu), 2: Jan 09 (Thu), 3: NaT departure, 4: NaT arrival
+    return parse([
+        pairing(departure='Jan 05,2025 06:00', arrival='Jan 05,2025 10:00'),
+        pairing(departure='Jan 07,2025 08:00', arrival='Jan 09,2025 12:00', duration='3'),
+        pairing(departure='Jan 09,2025 23:00', arrival='Jan 09,2025 23:30'),
+        pairing(departure='not a date'),
+        pairing(arrival=''),
+    ])
+
+
+@pytest.mark.parametrize('excluded_dates, expected', [
+    (['2025-01-08'], [0, 2, 3, 4]),                # middle day of the multi-day pairing
+    (['2025-01-07'], [0, 2, 3, 4]),                # its departure day
+    (['2025-01-09'], [0, 3, 4]),                   # its arrival day, and a same-day pairing
+    (['2025-01-01', '2025-01-04'], [0, 1, 2, 3, 4]),   # all before every pairing
+    (['2025-01-10', '2025-02-01'], [0, 1, 2, 3, 4]),   # all after every pairing
+    (['2025-01-06', '2025-01-10'], [0, 1, 2, 3, 4]),   # either side of the multi-day pairing
+    (['2025-01-10', '2025-01-06', '2025-01-05'], [1, 2, 3, 4]),  # unsorted input
+])
+def test_excluded_dates(trips, excluded_dates, expected):
+    # NaT rows never overlap an excluded date, so they are kept
+    assert sorted(pairing_core.apply_filters(trips, excluded_dates=excluded_dates).index) == expected
+
+
+@pytest.mark.parametrize('departure_date, expected', [
+    ('2025-01-05', [0]),      # first day of the frame
+    ('2025-01-09', [2]),      # last day of the frame (NaT rows sort after it)
+    ('2025-01-08', []),
+])
+def test_specific_departure_date(trips, departure_date, expected):
+    assert sorted(pairing_core.apply_filters(trips, specific_departure_date=departure_date).index) == expected
+
+
+def test_earliest_times_reject_nat_rows(trips):
+    midnight = pd.Timestamp('2025-01-01').time()
+    assert sorted(pairing_core.apply_filters(trips, earliest_departure=midnight).index) == [0, 1, 2, 4]
+    assert sorted(pairing_core.apply_filters(trips, earliest_arrival=midnight).index) == [0, 1, 2, 3]
+    late = pd.Timestamp('2025-01-01 23:00').time()
+    assert sorted(pairing_core.apply_filters(trips, earliest_departure=late).index) == [2]
+
+
+def test_no_matches_returns_empty_frame(trips):
+    filtered = pairing_core.apply_filters(trips, specific_departure_date='2025-01-05', min_duration=10.0)
+    assert filtered.empty
+    assert filtered.columns.tolist() == trips.columns.tolist()